@@ -6,7 +6,15 @@ import streamlit as st
 import plotly.express as px
 import plotly.graph_objects as go
 from datetime import datetime
+from enum import IntEnum
+from functools import lru_cache
+from collections import OrderedDict
+import json
+import os
 import re
+import sqlite3
+import threading
+from urllib.parse import urlparse
 
 # Configuración de la página
 st.set_page_config(
@@ -43,6 +51,113 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
+class Outcome(IntEnum):
+    """Resultado normalizado de una pelea"""
+    UNKNOWN = 0
+    WIN = 1
+    LOSS = 2
+    DRAW = 3
+    NO_CONTEST = 4
+
+class Method(IntEnum):
+    """Método normalizado de una pelea"""
+    UNKNOWN = 0
+    KO = 1
+    TKO = 2
+    UD = 3
+    SD = 4
+    MD = 5
+    PTS = 6
+    DQ = 7
+    RTD = 8
+    NC = 9
+    TD = 10
+
+# Columnas internas con los códigos de clasificación (no se muestran)
+OUTCOME_KEY = '_outcome'
+METHOD_KEY = '_method'
+CODE_KEYS = [OUTCOME_KEY, METHOD_KEY]
+
+KO_METHODS = (Method.KO, Method.TKO, Method.RTD)
+DECISION_METHODS = (Method.UD, Method.SD, Method.MD, Method.PTS, Method.TD)
+
+METHOD_ALTERNATIVES = r'TKO|(?<!T)KO|RTD|TD|UD|SD|MD|PTS|DQ|NC'
+
+# Result suele venir sin separadores ('WKO', 'LTD', 'KO5'). El resultado va al
+# inicio y solo cuenta si le sigue algo que no sea letra o un método pegado
+# ('W' no coincide en 'WORLD'); el método se busca después por separado.
+OUTCOME_PATTERN = re.compile(
+    r'^\s*(WIN|WON|LOSS|LOST|DRAW|NC|W|L|D)(?=[^A-Z]|$|' + METHOD_ALTERNATIVES + r')'
+)
+# Método sin letras alrededor ('KO' no coincide dentro de 'TKO')
+METHOD_PATTERN = re.compile(r'(?<![A-Z])(' + METHOD_ALTERNATIVES + r')(?![A-Z])')
+# Método pegado justo detrás del resultado
+GLUED_METHOD_PATTERN = re.compile(r'[\s\-/]*(' + METHOD_ALTERNATIVES + r')(?![A-Z])')
+
+OUTCOME_TOKENS = {
+    'WIN': Outcome.WIN, 'WON': Outcome.WIN, 'W': Outcome.WIN,
+    'LOSS': Outcome.LOSS, 'LOST': Outcome.LOSS, 'L': Outcome.LOSS,
+    'DRAW': Outcome.DRAW, 'D': Outcome.DRAW,
+    'NC': Outcome.NO_CONTEST,
+}
+
+OUTCOME_CODES = {int(code) for code in Outcome}
+METHOD_CODES = {int(code) for code in Method}
+
+def _cell_text(value):
+    """Normaliza una celda (puede venir vacía o como NaN desde un CSV)"""
+    return value.upper() if isinstance(value, str) else ''
+
+@lru_cache(maxsize=1024)
+def _classify_result(result):
+    """Clasifica el texto de Result; memoizado porque se repite mucho"""
+    outcome = Outcome.UNKNOWN
+    method = Method.UNKNOWN
+    
+    match = OUTCOME_PATTERN.match(result)
+    if match:
+        outcome = OUTCOME_TOKENS[match.group(1)]
+        glued = GLUED_METHOD_PATTERN.match(result, match.end())
+        if glued:
+            method = Method[glued.group(1)]
+    
+    if method == Method.UNKNOWN:
+        match = METHOD_PATTERN.search(result)
+        if match:
+            method = Method[match.group(1)]
+    
+    return int(outcome), int(method)
+
+def classify_fight(fight):
+    """Devuelve los códigos (resultado, método) de una pelea"""
+    outcome, method = _classify_result(_cell_text(fight.get('Result')))
+    
+    # Notes casi nunca se repite: solo se mira si Result no trae el método
+    if method == Method.UNKNOWN:
+        match = METHOD_PATTERN.search(_cell_text(fight.get('Notes')))
+        if match:
+            method = int(Method[match.group(1)])
+    
+    if outcome == Outcome.NO_CONTEST and method == Method.UNKNOWN:
+        method = int(Method.NC)
+    
+    return outcome, method
+
+def fight_codes(fight):
+    """Devuelve los códigos guardados si son válidos; si no, clasifica sin modificar la pelea"""
+    outcome = fight.get(OUTCOME_KEY)
+    method = fight.get(METHOD_KEY)
+    if (isinstance(outcome, int) and not isinstance(outcome, bool) and outcome in OUTCOME_CODES
+            and isinstance(method, int) and not isinstance(method, bool) and method in METHOD_CODES):
+        return outcome, method
+    return classify_fight(fight)
+
+def classify_fights(fights_data):
+    """Guarda los códigos de clasificación en cada pelea (se llama al extraer)"""
+    for fight in fights_data:
+        fight[OUTCOME_KEY], fight[METHOD_KEY] = classify_fight(fight)
+    return fights_data
+
 class SimpleBoxRecScraper:
     def __init__(self):
         self.session = requests.Session()
@@ -152,7 +267,8 @@ class SimpleBoxRecScraper:
                     if any(fight.values()):  # Solo añadir si tiene datos
                         fights_data.append(fight)
             
-            return fights_data
+            # Clasificar una sola vez al extraer
+            return classify_fights(fights_data)
             
         except Exception as e:
             st.warning(f"Error extrayendo tabla: {e}")
@@ -173,18 +289,18 @@ def calculate_stats(fights_data):
     }
     
     for fight in fights_data:
-        result = fight.get('Result', '').upper()
+        outcome, method = fight_codes(fight)
         
-        if 'W' in result:
+        if outcome == Outcome.WIN:
             stats['wins'] += 1
-        elif 'L' in result:
+        elif outcome == Outcome.LOSS:
             stats['losses'] += 1
-        elif 'D' in result:
+        elif outcome == Outcome.DRAW:
             stats['draws'] += 1
         
-        if 'KO' in result or 'TKO' in result:
+        if method in KO_METHODS:
             stats['kos'] += 1
-        elif any(decision in result for decision in ['UD', 'SD', 'MD', 'PTS']):
+        elif method in DECISION_METHODS:
             stats['decisions'] += 1
     
     # Calcular porcentajes
@@ -200,6 +316,174 @@ def calculate_stats(fights_data):
     
     return stats
 
+# Caché compartida entre sesiones
+def _env_int(name, default):
+    """Lee un entero positivo de una variable de entorno; si no es válido usa el valor por defecto"""
+    try:
+        value = int(os.environ.get(name, default))
+    except ValueError:
+        return default
+    return value if value > 0 else default
+
+CACHE_MAX_JSON_BYTES = _env_int('BOXREC_CACHE_MAX_JSON_MB', 64) * 1024 * 1024
+CACHE_TTL_SECONDS = _env_int('BOXREC_CACHE_TTL_SECONDS', 6 * 60 * 60)
+CACHE_DB_PATH = os.environ.get('BOXREC_CACHE_DB')  # Opcional: respaldo en SQLite
+
+BOXER_ID_PATTERN = re.compile(r'/box-pro/(\d+)')
+
+def boxer_cache_key(url):
+    """Clave de caché: el id de BoxRec si existe, si no host y ruta sin barra final"""
+    parsed = urlparse(url.strip())
+    match = BOXER_ID_PATTERN.search(parsed.path)
+    if match:
+        return f"box-pro/{match.group(1)}"
+    return f"{parsed.netloc.lower()}{parsed.path.rstrip('/')}"
+
+class SharedBoxerCache:
+    """Caché LRU de boxeadores compartida por todas las sesiones del proceso.
+
+    El límite es sobre el tamaño serializado: cada entrada cuenta la longitud de
+    su JSON, que ocupa bastante menos que los mismos datos como objetos Python.
+    Las entradas caducan a los ``ttl`` segundos de descargarse.
+    """
+    def __init__(self, max_json_bytes=CACHE_MAX_JSON_BYTES, ttl=CACHE_TTL_SECONDS, db_path=None):
+        self.max_json_bytes = max_json_bytes
+        self.ttl = ttl
+        self.entries = OrderedDict()  # clave -> (entrada, tamaño JSON)
+        self.total_json_bytes = 0
+        self.lock = threading.Lock()
+        self.in_flight = {}  # clave -> threading.Event de la descarga en curso
+        self.db = None
+        
+        if db_path:
+            self.db = sqlite3.connect(db_path, check_same_thread=False)
+            self.db.execute(
+                'CREATE TABLE IF NOT EXISTS boxers '
+                '(url TEXT PRIMARY KEY, data TEXT NOT NULL, fetched_at REAL NOT NULL)'
+            )
+            self.db.commit()
+    
+    def _expired(self, fetched_at):
+        return time.time() - fetched_at > self.ttl
+    
+    def get(self, key):
+        """Devuelve la entrada cacheada y vigente, o None"""
+        with self.lock:
+            cached = self.entries.get(key)
+            if cached is not None:
+                entry = cached[0]
+                if not self._expired(entry['fetched_at']):
+                    self.entries.move_to_end(key)
+                    return entry
+                self._remove(key)
+            
+            if self.db is not None:
+                row = self.db.execute(
+                    'SELECT data, fetched_at FROM boxers WHERE url = ?', (key,)
+                ).fetchone()
+                if row:
+                    if not self._expired(row[1]):
+                        entry = json.loads(row[0])
+                        self._store(key, entry, len(row[0]))
+                        return entry
+                    self.db.execute('DELETE FROM boxers WHERE url = ?', (key,))
+                    self.db.commit()
+        
+        return None
+    
+    def get_or_fetch(self, key, fetch):
+        """Devuelve la entrada; si falta, una sola llamada a fetch por clave aunque haya peticiones concurrentes"""
+        while True:
+            entry = self.get(key)
+            if entry is not None:
+                return entry
+            
+            with self.lock:
+                event = self.in_flight.get(key)
+                leader = event is None
+                if leader:
+                    event = self.in_flight[key] = threading.Event()
+            
+            if not leader:
+                # Otra sesión ya está descargando este boxeador
+                event.wait()
+                entry = self.get(key)
+                if entry is not None:
+                    return entry
+                with self.lock:
+                    if key in self.in_flight:
+                        continue
+                return None  # La descarga compartida falló
+            
+            try:
+                entry = fetch()
+                if entry is not None:
+                    self.put(key, entry)
+                return entry
+            finally:
+                with self.lock:
+                    del self.in_flight[key]
+                event.set()
+    
+    def put(self, key, entry):
+        """Guarda una entrada, desalojando las menos usadas si se supera el límite"""
+        entry.setdefault('fetched_at', time.time())
+        data = json.dumps(entry)
+        with self.lock:
+            self._store(key, entry, len(data))
+            if self.db is not None:
+                self.db.execute(
+                    'INSERT OR REPLACE INTO boxers (url, data, fetched_at) VALUES (?, ?, ?)',
+                    (key, data, entry['fetched_at'])
+                )
+                self.db.commit()
+    
+    def invalidate(self, key):
+        """Elimina una entrada de memoria y de SQLite"""
+        with self.lock:
+            self._remove(key)
+            if self.db is not None:
+                self.db.execute('DELETE FROM boxers WHERE url = ?', (key,))
+                self.db.commit()
+    
+    def _remove(self, key):
+        cached = self.entries.pop(key, None)
+        if cached is not None:
+            self.total_json_bytes -= cached[1]
+    
+    def _store(self, key, entry, size):
+        self._remove(key)
+        self.entries[key] = (entry, size)
+        self.total_json_bytes += size
+        # Siempre se conserva la entrada más reciente aunque supere el límite por sí sola
+        while self.total_json_bytes > self.max_json_bytes and len(self.entries) > 1:
+            _, (_, evicted_size) = self.entries.popitem(last=False)
+            self.total_json_bytes -= evicted_size
+
+@st.cache_resource
+def get_shared_cache():
+    """Una única caché por proceso, compartida entre sesiones"""
+    return SharedBoxerCache(db_path=CACHE_DB_PATH)
+
+def load_boxer(url, refresh=False):
+    """Obtiene info, peleas y estadísticas de un boxeador usando la caché compartida"""
+    def fetch():
+        scraper = SimpleBoxRecScraper()
+        boxer_info, fights_data = scraper.scrape_boxer_page(url)
+        if not (boxer_info and fights_data):
+            return None
+        return {
+            'boxer_info': boxer_info,
+            'fights_data': fights_data,
+            'stats': calculate_stats(fights_data)
+        }
+    
+    cache = get_shared_cache()
+    key = boxer_cache_key(url)
+    if refresh:
+        cache.invalidate(key)
+    return cache.get_or_fetch(key, fetch)
+
 def create_results_chart(stats):
     """Crear gráfico de resultados"""
     labels = ['Victorias', 'Derrotas', 'Empates']
@@ -226,26 +510,40 @@ def main():
     default_url = "https://boxrec.com/en/box-pro/125969"
     url = st.sidebar.text_input("URL de BoxRec:", value=default_url)
     
-    # Botón para scrapear
-    if st.sidebar.button("🔍 Scrapear Datos"):
+    # Botones para scrapear o forzar una actualización
+    col_scrape, col_refresh = st.sidebar.columns(2)
+    scrape = col_scrape.button("🔍 Scrapear Datos")
+    refresh = col_refresh.button("🔄 Actualizar")
+    
+    if scrape or refresh:
+        url = url.strip()
         if url:
-            scraper = SimpleBoxRecScraper()
-            
             with st.spinner("Scrapeando datos de BoxRec..."):
-                boxer_info, fights_data = scraper.scrape_boxer_page(url)
+                boxer = load_boxer(url, refresh=refresh)
             
-            if boxer_info and fights_data:
-                # Guardar en session state
-                st.session_state['boxer_info'] = boxer_info
-                st.session_state['fights_data'] = fights_data
+            if boxer:
+                # La sesión solo guarda la URL; los datos viven en la caché compartida
+                st.session_state['boxer_url'] = url
                 st.success("¡Datos scrapeados exitosamente!")
             else:
                 st.error("No se pudieron obtener los datos. Revisa la URL.")
     
     # Mostrar datos si están disponibles
-    if 'boxer_info' in st.session_state and 'fights_data' in st.session_state:
-        boxer_info = st.session_state['boxer_info']
-        fights_data = st.session_state['fights_data']
+    boxer = None
+    if 'boxer_url' in st.session_state:
+        boxer_url = st.session_state['boxer_url']
+        boxer = get_shared_cache().get(boxer_cache_key(boxer_url))
+        if boxer is None:
+            # Caducada o desalojada: se vuelve a descargar una sola vez para todas las sesiones
+            with st.spinner("Recargando datos de BoxRec..."):
+                boxer = load_boxer(boxer_url)
+            if boxer is None:
+                del st.session_state['boxer_url']
+                st.error("No se pudieron recargar los datos. Vuelve a scrapear.")
+    
+    if boxer:
+        boxer_info = boxer['boxer_info']
+        fights_data = boxer['fights_data']
         
         # Información del boxeador
         st.header("📋 Información del Boxeador")
@@ -256,8 +554,8 @@ def main():
         with col2:
             st.info(f"**Récord:** {boxer_info.get('record', 'No disponible')}")
         
-        # Calcular estadísticas
-        stats = calculate_stats(fights_data)
+        # Estadísticas ya calculadas en la caché
+        stats = boxer['stats']
         
         # Mostrar métricas
         st.header("📊 Estadísticas")
@@ -292,7 +590,7 @@ def main():
         # Tabla de peleas
         st.header("🥊 Historial de Peleas")
         if fights_data:
-            df = pd.DataFrame(fights_data)
+            df = pd.DataFrame(fights_data).drop(columns=CODE_KEYS, errors='ignore')
             st.dataframe(df, use_container_width=True)
             
             # Descargar CSV